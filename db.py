@@ -0,0 +1,56 @@
+# db.py
+import os
+import sqlite3
+
+MACROS = ["calories","protein","carbs","fats"]
+MEAL_COLUMNS = ["date","time","meal_type","meal_desc"] + MACROS
+WEIGHT_COLUMNS = ["date","time","weight_kg","note"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meals(date TEXT, time TEXT, meal_type TEXT, meal_desc TEXT,
+                                 calories REAL, protein REAL, carbs REAL, fats REAL);
+CREATE INDEX IF NOT EXISTS idx_meal_date ON meals(date);
+CREATE TABLE IF NOT EXISTS weights(date TEXT, time TEXT, weight_kg REAL, note TEXT);
+"""
+
+_CONNECTIONS = {}  # db path -> open connection
+
+def connect(user_dir, seed=None):
+    # seed() -> (meal entries, weight entries) to import when log.db is first created
+    path = os.path.join(user_dir, "log.db")
+    conn = _CONNECTIONS.get(path)
+    if conn is None:
+        fresh = not os.path.exists(path)
+        conn = sqlite3.connect(path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+        if fresh and seed is not None:
+            meals, weights = seed()
+            with conn:
+                conn.executemany("INSERT INTO meals VALUES(?,?,?,?,?,?,?,?)",
+                                 [tuple(e[c] for c in MEAL_COLUMNS) for e in meals])
+                conn.executemany("INSERT INTO weights VALUES(?,?,?,?)",
+                                 [tuple(e[c] for c in WEIGHT_COLUMNS) for e in weights])
+        _CONNECTIONS[path] = conn
+    return conn
+
+def insert_meal(conn, entry):
+    with conn:
+        conn.execute("INSERT INTO meals VALUES(?,?,?,?,?,?,?,?)", tuple(entry[c] for c in MEAL_COLUMNS))
+
+def insert_weight(conn, entry):
+    with conn:
+        conn.execute("INSERT INTO weights VALUES(?,?,?,?)", tuple(entry[c] for c in WEIGHT_COLUMNS))
+
+def daily_totals(conn, day):
+    count, *sums = conn.execute(
+        "SELECT COUNT(*), SUM(calories), SUM(protein), SUM(carbs), SUM(fats) FROM meals WHERE date=?",
+        (day,)).fetchone()
+    if not count:
+        return None
+    return dict(zip(MACROS, (float(v or 0) for v in sums)))
+
+def recent_weights(conn, n):
+    rows = conn.execute("SELECT date, time, weight_kg, note FROM weights ORDER BY rowid DESC LIMIT ?",
+                        (n,)).fetchall()
+    return [dict(zip(WEIGHT_COLUMNS, r)) for r in reversed(rows)]
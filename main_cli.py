@@ -1,39 +1,82 @@
 # main.py
 import os
+import sys
+import csv
+import atexit
+import signal
 import json
-from datetime import datetime, date
-import pandas as pd
+import math
+import functools
+from collections import defaultdict, deque, namedtuple
+from datetime import datetime
+import db
+from db import MACROS, WEIGHT_COLUMNS
+try:
+    import orjson  # faster profile (de)serialization when installed
+except ImportError:
+    orjson = None
+try:
+    import readline  # line editing + prefilled prompts where available
+except ImportError:
+    readline = None
+
+if orjson is not None:
+    def _jloads(b):
+        return orjson.loads(b)
+    def _jdumps(o):
+        return orjson.dumps(o, option=orjson.OPT_INDENT_2)
+else:
+    _jloads = json.loads
+    def _jdumps(o):
+        return json.dumps(o, indent=2).encode()
 
 # ===================================
 # Base Directories
 # ===================================
 BASE_DIR = "fitness_app"
 USERS_DIR = os.path.join(BASE_DIR, "users")
-os.makedirs(USERS_DIR, exist_ok=True)
+# "jsonl" (default) or "sqlite" for an indexed per-user log.db
+USE_SQLITE = os.environ.get("FITNESS_BACKEND", "jsonl") == "sqlite"
 
 # ===================================
 # Utility Functions
 # ===================================
+_USER_SET = None  # usernames on disk, listed once per process
+
+def _known_users():
+    global _USER_SET
+    if _USER_SET is None:
+        # a missing USERS_DIR just means nobody has signed up yet
+        _USER_SET = set(os.listdir(USERS_DIR)) if os.path.isdir(USERS_DIR) else set()
+    return _USER_SET
+
 def create_user_folder(username):
     user_dir = os.path.join(USERS_DIR, username)
-    os.makedirs(user_dir, exist_ok=True)
+    os.makedirs(user_dir, exist_ok=True)  # also creates USERS_DIR on first sign-up
     return user_dir
 
+UserPaths = namedtuple("UserPaths", ["profile", "meals", "weights"])
+
+@functools.lru_cache(maxsize=64)
 def user_paths(username):
     user_dir = os.path.join(USERS_DIR, username)
     profile = os.path.join(user_dir, "profile.json")
-    meals = os.path.join(user_dir, "meals.csv")
-    weights = os.path.join(user_dir, "weights.csv")
-    return profile, meals, weights
+    meals = os.path.join(user_dir, "meals.jsonl")
+    weights = os.path.join(user_dir, "weights.jsonl")
+    return UserPaths(profile, meals, weights)
 
 def init_user_files(username):
     profile_path, meals_path, weights_path = user_paths(username)
-    # initialize empty logs
-    if not os.path.exists(meals_path):
-        pd.DataFrame(columns=["date","time","meal_type","meal_desc","calories","protein","carbs","fats"]).to_csv(meals_path, index=False)
-    if not os.path.exists(weights_path):
-        pd.DataFrame(columns=["date","time","weight_kg","note"]).to_csv(weights_path, index=False)
-    if not os.path.exists(profile_path):
+    present = {entry.name for entry in os.scandir(os.path.dirname(profile_path))}
+    if USE_SQLITE:
+        _user_db(username)
+    else:
+        # initialize empty logs (JSONL, one entry per line, no header)
+        if os.path.basename(meals_path) not in present:
+            open(meals_path, "w").close()
+        if os.path.basename(weights_path) not in present:
+            open(weights_path, "w").close()
+    if os.path.basename(profile_path) not in present:
         default = {
             "name": username,
             "sex": "male",
@@ -44,18 +87,141 @@ def init_user_files(username):
             "goal": "maintenance",
             "protein_factor": 2.0
         }
-        with open(profile_path, "w") as f:
-            json.dump(default, f, indent=2)
+        with open(profile_path, "wb") as f:
+            f.write(_jdumps(default))
+
+_LOG_CACHE = {}  # path -> (mtime, list of entry dicts)
+
+def _log_mtime(path):
+    try:
+        return os.stat(path).st_mtime
+    except FileNotFoundError:
+        return None  # nothing flushed yet; treated as an empty log
+
+def _cached_read_log(path):
+    mtime = _log_mtime(path)
+    if mtime is None:
+        return []
+    hit = _LOG_CACHE.get(path)
+    if hit and hit[0] == mtime:
+        return hit[1]
+    with open(path) as f:
+        fadvise = hasattr(os, "posix_fadvise")
+        if fadvise:
+            # full sequential scan of a rarely re-read file: prefetch, then drop
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        rows = [json.loads(line) for line in f if line.strip()]
+        if fadvise:
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+    _LOG_CACHE[path] = (mtime, rows)
+    return rows
+
+# entries logged this session but not yet written; flushed in one batch per file
+_PENDING = defaultdict(list)  # path -> list of (entry dict, encoded line)
+_PENDING_PROFILES = {}  # username -> profile awaiting save
+
+def flush_pending():
+    for path, rows in _PENDING.items():
+        with open(path, "a", buffering=65536) as f:
+            f.write("".join(line for _, line in rows))
+        _LOG_CACHE.pop(path, None)
+        _TOTALS_CACHE.pop(path, None)
+    _PENDING.clear()
+    for username, profile in list(_PENDING_PROFILES.items()):
+        save_profile(username, profile)
+
+atexit.register(flush_pending)
+
+def _exit_on_signal(signum, frame):
+    raise SystemExit(128 + signum)  # unwinds normally, so atexit flushes
+
+def _install_signal_handlers():
+    # closing the terminal sends SIGHUP, which would otherwise skip atexit
+    for name in ("SIGTERM", "SIGHUP"):
+        if hasattr(signal, name):
+            signal.signal(getattr(signal, name), _exit_on_signal)
+
+def _read_log(path):
+    rows = _cached_read_log(path)
+    pending = _PENDING.get(path)
+    if pending:
+        rows = rows + [entry for entry, _ in pending]
+    return rows
+
+def _encode_entry(entry):
+    return json.dumps(entry, separators=(",", ":")) + "\n"
+
+_TOTALS_CACHE = {}  # path -> (mtime, {date: macro totals})
+
+def _daily_totals(path):
+    mtime = _log_mtime(path)
+    if mtime is None:
+        return {}
+    hit = _TOTALS_CACHE.get(path)
+    if hit and hit[0] == mtime:
+        return hit[1]
+    by_date = {}
+    for row in _cached_read_log(path):
+        day = by_date.setdefault(row["date"], dict.fromkeys(MACROS, 0.0))
+        for k in MACROS:
+            day[k] += float(row[k] or 0)
+    _TOTALS_CACHE[path] = (mtime, by_date)
+    return by_date
+
+def _migrate_csv_logs(username):
+    # logs were CSV before the switch to JSONL; fold any leftover CSV rows in
+    # ahead of newer entries once, then set the CSV aside
+    _, meals_path, weights_path = user_paths(username)
+    for path, numeric in ((meals_path, MACROS), (weights_path, ["weight_kg"])):
+        csv_path = path[:-len(".jsonl")] + ".csv"
+        if not os.path.exists(csv_path):
+            continue
+        with open(csv_path, newline="") as f:
+            rows = list(csv.DictReader(f))
+        for row in rows:
+            for k in numeric:
+                row[k] = float(row[k] or 0)
+        lines = "".join(_encode_entry(row) for row in rows)
+        if os.path.exists(path):
+            with open(path) as f:
+                lines += f.read()
+        with open(path + ".tmp", "w") as f:
+            f.write(lines)
+        os.replace(path + ".tmp", path)
+        os.replace(csv_path, csv_path + ".migrated")
+        _LOG_CACHE.pop(path, None)
+        _TOTALS_CACHE.pop(path, None)
+
+_PROFILE_CACHE = {}  # username -> (mtime, profile dict)
 
 def load_profile(username):
+    if username in _PENDING_PROFILES:
+        return _PENDING_PROFILES[username]
     profile_path, _, _ = user_paths(username)
-    with open(profile_path, "r") as f:
-        return json.load(f)
+    mtime = os.stat(profile_path).st_mtime
+    hit = _PROFILE_CACHE.get(username)
+    if hit and hit[0] == mtime:
+        return hit[1]
+    with open(profile_path, "rb") as f:
+        profile = _jloads(f.read())
+    _PROFILE_CACHE[username] = (mtime, profile)
+    return profile
 
 def save_profile(username, profile):
+    _PENDING_PROFILES.pop(username, None)
     profile_path, _, _ = user_paths(username)
-    with open(profile_path, "w") as f:
-        json.dump(profile, f, indent=2)
+    tmp_path = profile_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_jdumps(profile))
+    os.replace(tmp_path, profile_path)  # readers never see a half-written profile
+    _PROFILE_CACHE[username] = (os.stat(profile_path).st_mtime, profile)
+
+def patch_profile(username, **updates):
+    profile = load_profile(username)
+    profile.update(updates)
+    # written out by the next flush_pending()
+    _PENDING_PROFILES[username] = profile
+    return profile
 
 # ===================================
 # Fitness Logic
@@ -68,17 +234,24 @@ ACTIVITY_MULT = {
 }
 
 def calc_bmr(profile):
-    w = profile["weight_kg"]
-    h = profile["height_cm"]
-    age = profile["age"]
-    sex = profile.get("sex","male").lower()
+    return _calc_bmr_cached(profile["weight_kg"], profile["height_cm"], profile["age"],
+                            profile.get("sex","male").lower())
+
+@functools.lru_cache(maxsize=128)
+def _calc_bmr_cached(w, h, age, sex):
     return 10*w + 6.25*h - 5*age + (5 if sex=="male" else -161)
 
 def calc_targets(profile):
-    bmr = calc_bmr(profile)
-    activity = profile.get("activity","moderate")
+    # keyed on the values targets depend on, so profile edits miss the cache naturally
+    key = (profile["weight_kg"], profile["height_cm"], profile["age"],
+           profile.get("sex","male").lower(), profile.get("activity","moderate"),
+           profile.get("goal","maintenance"), profile.get("protein_factor", 2.0))
+    return dict(_calc_targets_cached(*key))
+
+@functools.lru_cache(maxsize=128)
+def _calc_targets_cached(w, h, age, sex, activity, goal, protein_factor):
+    bmr = _calc_bmr_cached(w, h, age, sex)
     tdee = bmr * ACTIVITY_MULT.get(activity, 1.55)
-    goal = profile.get("goal","maintenance")
 
     if goal == "fat_loss":
         target_cal = tdee * 0.8
@@ -87,7 +260,7 @@ def calc_targets(profile):
     else:
         target_cal = tdee
 
-    protein = profile.get("protein_factor", 2.0) * profile["weight_kg"]
+    protein = protein_factor * w
     carbs = (target_cal * 0.45) / 4
     fats  = (target_cal * 0.25) / 9
 
@@ -103,7 +276,13 @@ def calc_targets(profile):
 # ===================================
 # Tracker Functions
 # ===================================
-def log_meal(username):
+def _user_db(username):
+    profile_path, meals_path, weights_path = user_paths(username)
+    # a new log.db starts from whatever the JSONL backend already recorded
+    return db.connect(os.path.dirname(profile_path),
+                      seed=lambda: (_cached_read_log(meals_path), _cached_read_log(weights_path)))
+
+def log_meal(username, now=None):
     _, meals_path, _ = user_paths(username)
     meal_type = input("Meal (breakfast/lunch/dinner/snack): ").strip()
     meal_desc = input("Meal description: ").strip()
@@ -111,8 +290,11 @@ def log_meal(username):
     protein = float(input("Protein (g): ").strip() or 0)
     carbs = float(input("Carbs (g): ").strip() or 0)
     fats = float(input("Fats (g): ").strip() or 0)
+    if not all(math.isfinite(v) for v in (calories, protein, carbs, fats)):
+        print("❌ Calories and macros must be finite numbers.")
+        return
 
-    now = datetime.now()
+    now = now or datetime.now()
     entry = {
         "date": now.date().isoformat(),
         "time": now.time().strftime("%H:%M:%S"),
@@ -123,66 +305,102 @@ def log_meal(username):
         "carbs": carbs,
         "fats": fats
     }
-    df = pd.DataFrame([entry])
-    df.to_csv(meals_path, mode='a', header=not pd.io.common.file_exists(meals_path), index=False)
+    if USE_SQLITE:
+        db.insert_meal(_user_db(username), entry)
+    else:
+        # the line itself lands on disk on flush
+        _PENDING[meals_path].append((entry, _encode_entry(entry)))
     print("✅ Meal logged.")
 
-def show_daily_summary(username, profile):
-    _, meals_path, _ = user_paths(username)
-    if not os.path.exists(meals_path):
-        print("No meal data yet.")
-        return
-
-    df = pd.read_csv(meals_path)
-    today = date.today().isoformat()
-    today_df = df[df["date"] == today]
+def _today_totals(username, meals_path, today):
+    if USE_SQLITE:
+        totals = db.daily_totals(_user_db(username), today)
+        return totals or dict.fromkeys(MACROS, 0.0), totals is not None
+    by_date = _daily_totals(meals_path)
+    found = today in by_date
+    totals = dict(by_date.get(today) or dict.fromkeys(MACROS, 0.0))
+    for row, _ in _PENDING.get(meals_path, ()):
+        if row["date"] == today:
+            found = True
+            for k in MACROS:
+                totals[k] += float(row[k] or 0)
+    return totals, found
 
-    if today_df.empty:
-        print("No meals logged today.")
-        totals = {"calories":0,"protein":0,"carbs":0,"fats":0}
-    else:
-        totals = today_df[["calories","protein","carbs","fats"]].sum().to_dict()
+def show_daily_summary(username, profile, now=None):
+    _, meals_path, _ = user_paths(username)
+    today = (now or datetime.now()).date().isoformat()
+    totals, found = _today_totals(username, meals_path, today)
 
     targets = calc_targets(profile)
-    print(f"\n--- {username}'s Summary ({today}) ---")
-    print(f"Target: {targets}")
-    print(f"Consumed: {totals}")
-    for k in ["calories","protein","carbs","fats"]:
+    lines = [] if found else ["No meals logged today."]
+    lines += [f"\n--- {username}'s Summary ({today}) ---",
+              f"Target: {targets}",
+              f"Consumed: {totals}"]
+    for k in MACROS:
         consumed = totals.get(k,0)
         targ = targets[k]
         if consumed > targ:
-            print(f"⚠️ Exceeded {k} by {consumed - targ:.1f}")
+            lines.append(f"⚠️ Exceeded {k} by {consumed - targ:.1f}")
         else:
-            print(f"✅ {k} remaining: {targ - consumed:.1f}")
+            lines.append(f"✅ {k} remaining: {targ - consumed:.1f}")
+    sys.stdout.write("\n".join(lines) + "\n")
 
-def log_weight(username, profile):
+def log_weight(username, now=None):
     _, _, weights_path = user_paths(username)
     w = float(input("Enter current weight (kg): ").strip())
+    if not math.isfinite(w):
+        print("❌ Weight must be a finite number.")
+        return
     note = input("Note (optional): ").strip()
-    now = datetime.now()
+    now = now or datetime.now()
     entry = {"date": now.date().isoformat(), "time": now.time().strftime("%H:%M:%S"), "weight_kg": w, "note": note}
-    df = pd.DataFrame([entry])
-    df.to_csv(weights_path, mode='a', header=not pd.io.common.file_exists(weights_path), index=False)
-    profile["weight_kg"] = w
-    save_profile(username, profile)
+    if USE_SQLITE:
+        db.insert_weight(_user_db(username), entry)
+    else:
+        _PENDING[weights_path].append((entry, _encode_entry(entry)))
+    patch_profile(username, weight_kg=w)
     print("✅ Weight logged and profile updated.")
 
 def show_weight_history(username):
     _, _, weights_path = user_paths(username)
-    if not os.path.exists(weights_path):
+    if USE_SQLITE:
+        last = db.recent_weights(_user_db(username), 10)
+    else:
+        last = deque(_read_log(weights_path), maxlen=10)
+    if not last:
         print("No weights yet.")
         return
-    df = pd.read_csv(weights_path)
-    print(df.tail(10).to_string(index=False))
+    table = [WEIGHT_COLUMNS] + [[str(row.get(c, "")) for c in WEIGHT_COLUMNS] for row in last]
+    widths = [max(len(r[i]) for r in table) for i in range(len(WEIGHT_COLUMNS))]
+    sys.stdout.write("".join(" ".join(v.rjust(wd) for v, wd in zip(r, widths)) + "\n" for r in table))
 
 # ===================================
 # Profile Update
 # ===================================
+PROFILE_FIELDS = ["name","sex","age","height_cm","weight_kg","activity","goal","protein_factor"]
+
+def _prefilled_input(prompt, text):
+    if readline is None:
+        return input(prompt)
+    readline.set_startup_hook(lambda: readline.insert_text(text))
+    try:
+        return input(prompt)
+    finally:
+        readline.set_startup_hook()
+
 def update_profile(username, profile):
-    print("Leave blank to keep current value.")
-    for key in ["name","sex","age","height_cm","weight_kg","activity","goal","protein_factor"]:
+    which = input(f"Field to edit ({', '.join(PROFILE_FIELDS)}) or 'all': ").strip()
+    if which == "all":
+        keys = PROFILE_FIELDS
+        print("Press Enter to keep the current value.")
+    elif which in PROFILE_FIELDS:
+        keys = [which]
+    else:
+        print("Invalid choice.")
+        return
+    for key in keys:
         cur = profile.get(key)
-        val = input(f"{key} (current: {cur}): ").strip()
+        val = _prefilled_input(f"{key} (current: {cur}): ", "" if cur is None else str(cur)).strip()
         if val == "":
             continue
         if key in ["age"]:
@@ -199,65 +417,77 @@ def update_profile(username, profile):
 # ===================================
 def sign_up():
     username = input("Choose a username: ").strip().lower()
-    user_dir = os.path.join(USERS_DIR, username)
-    if os.path.exists(user_dir):
+    if not username or username in _known_users():
         print("⚠️ Username already exists. Try signing in.")
         return None
     create_user_folder(username)
     init_user_files(username)
+    _known_users().add(username)
     print(f"✅ Account created for {username}. You can now sign in.")
     return username
 
 def sign_in():
     username = input("Enter your username: ").strip().lower()
-    user_dir = os.path.join(USERS_DIR, username)
-    if not os.path.exists(user_dir):
+    if username not in _known_users():
         print("❌ No such user found. Please sign up first.")
         return None
+    _migrate_csv_logs(username)
+    if USE_SQLITE:
+        _user_db(username)
     print(f"✅ Signed in as {username}")
     return username
 
 # ===================================
 # Main Menu
 # ===================================
+USER_MENU = """1) View profile & targets
+2) Update profile
+3) Log meal
+4) Show today's summary
+5) Log weight
+6) Show weight history
+7) Sign out
+"""
+
+MAIN_MENU = """
+=== Fitness Tracker ===
+1) Sign up
+2) Sign in
+3) Exit
+"""
+
 def user_menu(username):
-    profile = load_profile(username)
     while True:
-        print(f"\n--- Welcome, {username}! ---")
-        print("1) View profile & targets")
-        print("2) Update profile")
-        print("3) Log meal")
-        print("4) Show today's summary")
-        print("5) Log weight")
-        print("6) Show weight history")
-        print("7) Sign out")
+        profile = load_profile(username)  # cached; picks up patches and edits
+        sys.stdout.write(f"\n--- Welcome, {username}! ---\n" + USER_MENU)
         choice = input("Choose: ").strip()
+        now = datetime.now()  # one clock reading per menu action, taken once it is chosen
 
         if choice == "1":
-            print(json.dumps(profile, indent=2))
-            print("Targets:", calc_targets(profile))
+            sys.stdout.write(f"{json.dumps(profile, indent=2)}\nTargets: {calc_targets(profile)}\n")
         elif choice == "2":
             update_profile(username, profile)
         elif choice == "3":
-            log_meal(username)
+            log_meal(username, now)
         elif choice == "4":
-            show_daily_summary(username, profile)
+            show_daily_summary(username, profile, now)
         elif choice == "5":
-            log_weight(username, profile)
+            log_weight(username, now)
         elif choice == "6":
             show_weight_history(username)
         elif choice == "7":
+            flush_pending()
             print("👋 Signed out.")
             break
         else:
             print("Invalid choice.")
+        # at most one action's entries are ever held in memory
+        flush_pending()
 
 def main():
+    _install_signal_handlers()
     while True:
-        print("\n=== Fitness Tracker ===")
-        print("1) Sign up")
-        print("2) Sign in")
-        print("3) Exit")
+        sys.stdout.write(MAIN_MENU)
         choice = input("Choose: ").strip()
         if choice == "1":
             user = sign_up()